@@ -16,4 +16,12 @@ LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "true")
 LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY", "")
 LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "basic-agent")
 
-GROQ_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
\ No newline at end of file
+GROQ_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+
+API_WORKERS = int(os.getenv("API_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-int8")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "2"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TOP_K = 3
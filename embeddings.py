@@ -0,0 +1,82 @@
+"""
+basic_agent/embeddings.py - Int8 ONNX Runtime sentence embeddings
+"""
+
+import os
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+from config import EMBEDDING_MODEL, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS
+
+
+MODEL_FILE = "model_quantized.onnx"
+MAX_TOKENS = 256
+
+
+def export_quantized_model(model_name: str = EMBEDDING_MODEL, output_dir: str = EMBEDDING_ONNX_DIR):
+    """
+    Export a sentence-transformers model to ONNX and quantize its weights to int8.
+
+    Build step, run once with `python embeddings.py` before starting the API.
+    Requires `optimum[onnxruntime]`, which is not a runtime dependency.
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer
+
+    print(f"📦 Exporting {model_name} to ONNX (int8)...")
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    quantize_dynamic(
+        os.path.join(output_dir, "model.onnx"),
+        os.path.join(output_dir, MODEL_FILE),
+        weight_type=QuantType.QInt8
+    )
+
+
+class OnnxEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings from a quantized ONNX model"""
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_DIR, threads: int = EMBEDDING_THREADS):
+        if not os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+            raise FileNotFoundError(
+                f"{os.path.join(model_dir, MODEL_FILE)} not found, export it with `python embeddings.py`"
+            )
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Embed a batch of texts, returns a (len(texts), dim) float32 array"""
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self._session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, as sentence-transformers does
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+if __name__ == "__main__":
+    export_quantized_model()
+    print(f"✅ Saved to {EMBEDDING_ONNX_DIR}")
@@ -1,15 +1,40 @@
-from typing import Annotated, TypedDict
+from typing import Annotated, Optional, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_openai import ChatOpenAI
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langsmith import traceable
 import sqlite3
+import threading
+import hashlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime
 
 from config import *
 from tools import ALL_TOOLS
+from semantic_cache import SemanticCache
+
+
+
+RESPONSE_CACHE_SIZE = 512
+CONTEXT_MESSAGES = 5
+CONTEXT_TOKEN_BUDGET = 800
+
+# OpenAI-format tool schema, built once instead of on every bind
+TOOL_SCHEMA = [convert_to_openai_tool(t) for t in ALL_TOOLS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)"""
+    return len(text) // 4
+
+
+def prefix_hash(text: str) -> str:
+    """Stable short digest of a prompt prefix"""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
 
 
 
@@ -22,63 +47,274 @@ class ChatState(TypedDict):
 class MemoryManager:
     """Simple memory with SQLite storage"""
     
+    # Fixed statement text (LIMIT bound as a parameter) so sqlite3's statement cache reuses the prepared plans
+    _INSERT_SESSION_SQL = "INSERT OR IGNORE INTO sessions (uuid) VALUES (?)"
+    _INSERT_MESSAGE_SQL = """INSERT INTO chat_history (session_fk, role, content) 
+                             SELECT id, ?, ? FROM sessions WHERE uuid = ?"""
+    _RECENT_MESSAGES_SQL = """SELECT h.role, h.content FROM chat_history h 
+                              JOIN sessions s ON s.id = h.session_fk 
+                              WHERE s.uuid = ? 
+                              ORDER BY h.id DESC LIMIT ?"""
+    _DELETE_SESSION_SQL = """DELETE FROM chat_history 
+                             WHERE session_fk = (SELECT id FROM sessions WHERE uuid = ?)"""
+    _UPSERT_META_SQL = """INSERT INTO session_meta (session_fk, first_user_message, last_timestamp, msg_count) 
+                          SELECT id, ?, CURRENT_TIMESTAMP, ? FROM sessions WHERE uuid = ? 
+                          ON CONFLICT(session_fk) DO UPDATE SET 
+                              last_timestamp = excluded.last_timestamp, 
+                              msg_count = session_meta.msg_count + excluded.msg_count, 
+                              first_user_message = COALESCE(session_meta.first_user_message, excluded.first_user_message)"""
+    _DELETE_META_SQL = """DELETE FROM session_meta 
+                          WHERE session_fk = (SELECT id FROM sessions WHERE uuid = ?)"""
+    _DELETE_SESSION_ROW_SQL = "DELETE FROM sessions WHERE uuid = ?"
+    _LAST_MESSAGE_ID_SQL = """SELECT MAX(h.id) FROM chat_history h 
+                              JOIN sessions s ON s.id = h.session_fk 
+                              WHERE s.uuid = ?"""
+    
     def __init__(self, db_path: str = "chat_history.db"):
         self.db_path = db_path
+        # One long-lived connection shared by all requests, guarded by a lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        # LRU of answers keyed by (context hash, message hash); read from the event loop,
+        # so it has its own lock and never waits behind SQLite work holding self._lock
+        self._responses: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._responses_lock = threading.Lock()
+        # Last messages per session, filled from SQLite once and then kept in sync on write
+        self._recent: dict[str, deque[tuple[str, str]]] = {}
+        # With several uvicorn workers on one DB, the newest chat_history id each cached
+        # session had when we last saw it (ids only grow, AUTOINCREMENT never reuses them)
+        self._shared_db = API_WORKERS > 1
+        self._last_ids: dict[str, int] = {}
         self._init_db()
+        # Optional: without it every request simply goes to the LLM
+        try:
+            self.semantic_cache = SemanticCache(self._conn, self._lock)
+        except Exception as e:
+            print(f"⚠️ Semantic cache disabled: {e}")
+            self.semantic_cache = None
     
     def _init_db(self):
         """Initialize database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chat_history (
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute("PRAGMA cache_size=-20000")
+            
+            with self._transaction() as conn:
+                # Session UUIDs are stored once, messages reference them by integer key
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        id INTEGER PRIMARY KEY,
+                        uuid TEXT NOT NULL UNIQUE
+                    )
+                """)
+                
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(chat_history)")]
+                if "session_id" in columns:
+                    self._migrate_session_ids(conn)
+                
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        session_fk INTEGER NOT NULL REFERENCES sessions(id),
+                        role TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # Recent-messages lookups and the one-time session_meta backfill
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_session_fk_desc ON chat_history(session_fk, id DESC)"
+                )
+                # The sidebar preview now comes from session_meta, this index only cost writes
+                conn.execute("DROP INDEX IF EXISTS idx_session_fk_role")
+                
+                # Per-session summary for the sidebar, maintained by add_messages
+                has_meta = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'session_meta'"
+                ).fetchone()
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS session_meta (
+                        session_fk INTEGER PRIMARY KEY REFERENCES sessions(id),
+                        first_user_message TEXT,
+                        last_timestamp DATETIME,
+                        msg_count INTEGER DEFAULT 0
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_session_meta_last ON session_meta(last_timestamp)"
+                )
+                if not has_meta:
+                    conn.execute("""
+                        INSERT INTO session_meta (session_fk, first_user_message, last_timestamp, msg_count)
+                        SELECT 
+                            h.session_fk,
+                            (SELECT content FROM chat_history 
+                             WHERE session_fk = h.session_fk AND role = 'user' 
+                             ORDER BY id LIMIT 1),
+                            MAX(h.timestamp),
+                            COUNT(*)
+                        FROM chat_history h 
+                        GROUP BY h.session_fk
+                    """)
+    
+    def _migrate_session_ids(self, conn: sqlite3.Connection):
+        """Move a chat_history table keyed by session_id TEXT to the sessions table"""
+        print("🔄 Migrating chat_history to integer session keys...")
+        conn.execute("INSERT OR IGNORE INTO sessions (uuid) SELECT DISTINCT session_id FROM chat_history")
+        conn.execute("ALTER TABLE chat_history RENAME TO chat_history_old")
+        conn.execute("""
+            CREATE TABLE chat_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
+                session_fk INTEGER NOT NULL REFERENCES sessions(id),
                 role TEXT NOT NULL,
                 content TEXT NOT NULL,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """)
-        conn.commit()
-        conn.close()
+        conn.execute("""
+            INSERT INTO chat_history (id, session_fk, role, content, timestamp)
+            SELECT h.id, s.id, h.role, h.content, h.timestamp
+            FROM chat_history_old h JOIN sessions s ON s.uuid = h.session_id
+            ORDER BY h.id
+        """)
+        # Also drops the old session_id indexes
+        conn.execute("DROP TABLE chat_history_old")
+    
+    def ping(self):
+        """Check that the database connection is usable"""
+        with self._lock:
+            self._conn.execute("SELECT 1").fetchone()
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one write transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Also covers a failed COMMIT, so the shared connection never stays mid-transaction
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
     
     @traceable(name="add_message_to_memory")
     def add_message(self, session_id: str, role: str, content: str):
         """Add message to history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO chat_history (session_id, role, content) VALUES (?, ?, ?)",
-            (session_id, role, content)
-        )
-        conn.commit()
-        conn.close()
+        self.add_messages(session_id, [(role, content)])
+    
+    @traceable(name="add_messages_to_memory")
+    def add_messages(self, session_id: str, pairs: list[tuple[str, str]]):
+        """Add several (role, content) messages to history in a single transaction"""
+        with self._lock:
+            with self._transaction() as conn:
+                # Nobody else wrote to the session since we last saw it
+                in_sync = not self._shared_db or self._last_ids.get(session_id) == self._last_message_id(session_id)
+                conn.execute(self._INSERT_SESSION_SQL, (session_id,))
+                conn.executemany(
+                    self._INSERT_MESSAGE_SQL,
+                    [(role, content, session_id) for role, content in pairs]
+                )
+                first_user_message = next((c for r, c in pairs if r == "user"), None)
+                conn.execute(self._UPSERT_META_SQL, (first_user_message, len(pairs), session_id))
+                if self._shared_db and in_sync:
+                    self._last_ids[session_id] = self._last_message_id(session_id)
+            recent = self._recent.get(session_id)
+            if recent is not None:
+                # Out of sync, the stored id stays behind and get_context reloads the session
+                recent.extend(pairs)
     
     @traceable(name="get_recent_messages_from_memory")
     def get_recent_messages(self, session_id: str, limit: int = 5):
         """Get recent messages"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            """SELECT role, content FROM chat_history 
-               WHERE session_id = ? 
-               ORDER BY id DESC LIMIT ?""",
-            (session_id, limit)
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        with self._lock:
+            rows = self._conn.execute(self._RECENT_MESSAGES_SQL, (session_id, limit)).fetchall()
         return [{"role": r[0], "content": r[1]} for r in reversed(rows)]
     
+    def clear(self, session_id: str) -> int:
+        """Delete all messages of a session, returns number of deleted rows"""
+        with self._lock:
+            with self._transaction() as conn:
+                cursor = conn.execute(self._DELETE_SESSION_SQL, (session_id,))
+                conn.execute(self._DELETE_META_SQL, (session_id,))
+                conn.execute(self._DELETE_SESSION_ROW_SQL, (session_id,))
+            self._recent.pop(session_id, None)
+            self._last_ids.pop(session_id, None)
+            if self.semantic_cache:
+                self.semantic_cache.clear(session_id)
+            return cursor.rowcount
+    
+    def _last_message_id(self, session_id: str) -> int:
+        """Id of the newest message of a session, 0 if it has none"""
+        return self._conn.execute(self._LAST_MESSAGE_ID_SQL, (session_id,)).fetchone()[0] or 0
+    
+    def _drop_stale_session(self, session_id: str):
+        """Forget in-memory state of a session if another process (uvicorn worker) wrote to it"""
+        if not self._shared_db:
+            # Single worker: every write goes through this instance, the caches are never stale
+            return
+        last_id = self._last_message_id(session_id)
+        if self._last_ids.get(session_id) != last_id:
+            self._recent.pop(session_id, None)
+            self._last_ids[session_id] = last_id
+            if self.semantic_cache:
+                self.semantic_cache.invalidate(session_id)
+    
     @traceable(name="get_conversation_context")
     def get_context(self, session_id: str) -> str:
         """Get conversation context"""
-        recent = self.get_recent_messages(session_id, limit=5)
+        with self._lock:
+            self._drop_stale_session(session_id)
+            recent = self._recent.get(session_id)
+            if recent is None:
+                # Cold session: load it once, later turns are appended by add_messages
+                recent = deque(
+                    ((m["role"], m["content"]) for m in self.get_recent_messages(session_id, CONTEXT_MESSAGES)),
+                    maxlen=CONTEXT_MESSAGES
+                )
+                self._recent[session_id] = recent
+            recent = list(recent)
+        
+        # Keep the newest messages that fit in the token budget
+        lines = []
+        budget = CONTEXT_TOKEN_BUDGET
+        for role, content in reversed(recent):
+            line = f"{role}: {content}"
+            tokens = estimate_tokens(line)
+            if tokens > budget:
+                if budget > 0:
+                    # Keep the end of the message, the part next to the newer messages
+                    lines.append(f"{role}: ..." + content[-budget * 4:])
+                break
+            lines.append(line)
+            budget -= tokens
+        recent_text = "\n".join(reversed(lines))
         
-        if recent:
-            recent_text = "\n".join([f"{m['role']}: {m['content']}" for m in recent])
+        if recent_text:
             return f"Recent conversation:\n{recent_text}"
         
         return ""
+    
+    def get_cached_response(self, context: str, message: str) -> Optional[str]:
+        """Return the stored answer for this exact context and message, if any"""
+        key = (prefix_hash(context), prefix_hash(message))
+        with self._responses_lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+            return response
+    
+    def cache_response(self, context: str, message: str, response: str):
+        """Remember the answer given for this context and message"""
+        key = (prefix_hash(context), prefix_hash(message))
+        with self._responses_lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            if len(self._responses) > RESPONSE_CACHE_SIZE:
+                self._responses.popitem(last=False)
 
 
 
@@ -100,15 +336,15 @@ def create_agent():
         streaming=True
     )
     
-    llm_with_tools = llm.bind_tools(ALL_TOOLS)
+    llm_with_tools = llm.bind(tools=TOOL_SCHEMA, tool_choice="auto")
     
     memory = MemoryManager()
     
     @traceable(name="chat_node")
-    def chat_node(state: ChatState):
+    async def chat_node(state: ChatState):
         """Just invoke LLM, nothing else"""
         messages = state['messages']
-        response = llm_with_tools.invoke(messages)
+        response = await llm_with_tools.ainvoke(messages)
         return {"messages": [response]}
     
     graph = StateGraph(ChatState)
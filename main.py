@@ -8,19 +8,142 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
-from langchain_core.messages import HumanMessage, SystemMessage
-import sqlite3
+from langchain_core.messages import AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
 from contextlib import asynccontextmanager
-import json
+from dataclasses import dataclass, field
 import asyncio
+import functools
+import orjson
 
 from graph import create_agent
+from tools import close_http_client
 from config import *
 
 
 agent_graph = None
 memory_manager = None
 
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+
+
+@functools.lru_cache(maxsize=256)
+def _sys_msg(context: str) -> SystemMessage:
+    """SystemMessage for a context, reused while the context is unchanged"""
+    return SystemMessage(content=context)
+
+
+def _sse(data: dict) -> bytes:
+    """Encode one Server-Sent Event"""
+    return SSE_PREFIX + orjson.dumps(data) + SSE_SUFFIX
+
+
+@dataclass
+class StreamState:
+    """Output accumulated while streaming one chat turn"""
+    full_response: str = ""
+    current_content: str = ""
+    tool_outputs: list = field(default_factory=list)
+    # Tool names of the current model turn, announced once the turn is complete
+    tool_names: list = field(default_factory=list)
+
+
+def _flush_tool_calls(state: StreamState):
+    """Announce all tool calls of the finished model turn in one event"""
+    if not state.tool_names:
+        return
+    tool_info = {
+        "type": "tool_call",
+        "tools": state.tool_names
+    }
+    yield _sse(tool_info)
+    state.tool_names = []
+    # Save content before tool execution
+    if state.current_content:
+        state.full_response = state.current_content
+    # Reset content for response after tool execution
+    state.current_content = ""
+
+
+def _on_ai_chunk(msg_chunk: AIMessageChunk, state: StreamState):
+    """Handle streaming tokens and tool calls from LLM"""
+    token = msg_chunk.content
+    if token:
+        state.current_content += token
+        chunk_data = {
+            "type": "token",
+            "token": token,
+            "content": state.current_content
+        }
+        yield _sse(chunk_data)
+    
+    # Each tool call's name arrives in its own chunk, collect them until the turn ends
+    state.tool_names.extend(tc["name"] for tc in msg_chunk.tool_call_chunks if tc.get("name"))
+    if getattr(msg_chunk, "chunk_position", None) == "last":
+        yield from _flush_tool_calls(state)
+
+
+def _on_tool_message(msg_chunk: ToolMessage, state: StreamState):
+    """Handle tool execution END with output"""
+    # In case the model turn ended without a final chunk
+    yield from _flush_tool_calls(state)
+    
+    tool_name = msg_chunk.name or "unknown"
+    tool_output = str(msg_chunk.content)
+    
+    # Store tool output
+    state.tool_outputs.append({
+        "tool": tool_name,
+        "output": tool_output
+    })
+    
+    tool_data = {
+        "type": "tool_result",
+        "status": "completed",
+        "tool": tool_name,
+        "preview": tool_output[:200] + "..." if len(tool_output) > 200 else tool_output
+    }
+    yield _sse(tool_data)
+
+
+# One dict lookup per streamed message instead of an isinstance chain
+STREAM_HANDLERS = {
+    AIMessageChunk: _on_ai_chunk,
+    ToolMessage: _on_tool_message,
+}
+
+
+async def _semantic_lookup(session_id: str, message: str):
+    """
+    Embed the query and look it up in the semantic cache.
+    
+    The cache is only an optimization: if it is disabled or fails, this is
+    a miss. Returns (query embedding or None, cached answer or None).
+    """
+    semantic_cache = memory_manager.semantic_cache
+    if semantic_cache is None:
+        return None, None
+    
+    embedding = None
+    try:
+        embedding = await asyncio.to_thread(semantic_cache.embed, message)
+        return embedding, await asyncio.to_thread(semantic_cache.lookup, session_id, embedding)
+    except Exception as e:
+        print(f"⚠️ Semantic cache lookup failed: {e}")
+        return embedding, None
+
+
+async def _semantic_record(session_id: str, message: str, embedding, response):
+    """Store a turn in the semantic cache, ignoring cache failures"""
+    semantic_cache = memory_manager.semantic_cache
+    if semantic_cache is None or embedding is None:
+        return
+    
+    try:
+        await asyncio.to_thread(semantic_cache.record, session_id, message, embedding, response)
+    except Exception as e:
+        print(f"⚠️ Semantic cache record failed: {e}")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -36,6 +159,7 @@ async def lifespan(app: FastAPI):
     yield
     
     print("Shutting down...")
+    await close_http_client()
 
 
 
@@ -88,8 +212,9 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     try:
-        conn = sqlite3.connect("chat_history.db")
-        conn.close()
+        if not memory_manager:
+            raise RuntimeError("memory manager not initialized")
+        await asyncio.to_thread(memory_manager.ping)
         db_status = "connected"
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -121,19 +246,39 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=503, detail="Agent not initialized")
     
     try:
-        context = memory_manager.get_context(request.session_id)
+        context = await asyncio.to_thread(memory_manager.get_context, request.session_id)
         
         messages = []
         if context:
-            messages.append(SystemMessage(content=context))
+            messages.append(_sys_msg(context))
         messages.append(HumanMessage(content=request.message))
         
-        result = agent_graph.invoke({"messages": messages})
+        query_embedding, semantic_hit = await _semantic_lookup(request.session_id, request.message)
         
-        response_content = result['messages'][-1].content
+        response_content = memory_manager.get_cached_response(context, request.message)
+        if response_content is None:
+            response_content = semantic_hit
+        cacheable = True
+        if response_content is None:
+            result = await agent_graph.ainvoke({"messages": messages})
+            response_content = result['messages'][-1].content
+            
+            # Tool answers (weather, time, ...) go stale, only cache plain answers
+            cacheable = not any(isinstance(m, ToolMessage) for m in result['messages'])
+            if cacheable:
+                memory_manager.cache_response(context, request.message, response_content)
         
-        memory_manager.add_message(request.session_id, "user", request.message)
-        memory_manager.add_message(request.session_id, "assistant", response_content)
+        await asyncio.to_thread(
+            memory_manager.add_messages,
+            request.session_id,
+            [("user", request.message), ("assistant", response_content)]
+        )
+        await _semantic_record(
+            request.session_id,
+            request.message,
+            query_embedding,
+            response_content if cacheable else None
+        )
         
         return ChatResponse(
             response=response_content,
@@ -164,109 +309,73 @@ async def chat_stream(request: ChatRequest):
     async def generate():
         try:
             # Get conversation context
-            context = memory_manager.get_context(request.session_id)
+            context = await asyncio.to_thread(memory_manager.get_context, request.session_id)
             
             messages = []
             if context:
-                messages.append(SystemMessage(content=context))
+                messages.append(_sys_msg(context))
             messages.append(HumanMessage(content=request.message))
             
-            # Store full response
-            full_response = ""
-            current_content = ""
-            tool_outputs = []
+            state = StreamState()
             
-            # Stream the response with astream_events for token-level streaming
-            async for event in agent_graph.astream_events(
-                {"messages": messages},
-                version="v1"
-            ):
-                kind = event.get("event")
-                
-                # Handle streaming tokens from LLM
-                if kind == "on_chat_model_stream":
-                    chunk = event.get("data", {}).get("chunk", {})
-                    if hasattr(chunk, 'content'):
-                        token = chunk.content
-                        if token:
-                            current_content += token
-                            chunk_data = {
-                                "type": "token",
-                                "token": token,
-                                "content": current_content
-                            }
-                            yield f"data: {json.dumps(chunk_data)}\n\n"
-                            await asyncio.sleep(0.01)
-                
-                # Handle tool calls
-                elif kind == "on_chat_model_end":
-                    chunk = event.get("data", {}).get("output", {})
-                    if hasattr(chunk, 'tool_calls') and chunk.tool_calls:
-                        tool_info = {
-                            "type": "tool_call",
-                            "tools": [tc.get('name', 'unknown') for tc in chunk.tool_calls]
-                        }
-                        yield f"data: {json.dumps(tool_info)}\n\n"
-                        await asyncio.sleep(0.01)
-                        # Save content before tool execution
-                        if current_content:
-                            full_response = current_content
-                        # Reset content for response after tool execution
-                        current_content = ""
-                
-                # Handle tool execution START
-                elif kind == "on_tool_start":
-                    tool_name = event.get("name", "unknown")
-                    tool_start_data = {
-                        "type": "tool_start",
-                        "tool": tool_name
-                    }
-                    yield f"data: {json.dumps(tool_start_data)}\n\n"
-                    await asyncio.sleep(0.01)
-                
-                # Handle tool execution END with output
-                elif kind == "on_tool_end":
-                    tool_name = event.get("name", "unknown")
-                    tool_output = event.get("data", {}).get("output", "")
-                    
-                    # Store tool output
-                    tool_outputs.append({
-                        "tool": tool_name,
-                        "output": tool_output
-                    })
-                    
-                    tool_data = {
-                        "type": "tool_result",
-                        "status": "completed",
-                        "tool": tool_name,
-                        "preview": str(tool_output)[:200] + "..." if len(str(tool_output)) > 200 else str(tool_output)
-                    }
-                    yield f"data: {json.dumps(tool_data)}\n\n"
-                    await asyncio.sleep(0.01)
+            query_embedding, semantic_hit = await _semantic_lookup(request.session_id, request.message)
+            
+            cached = memory_manager.get_cached_response(context, request.message)
+            if cached is None:
+                cached = semantic_hit
+            if cached is not None:
+                state.current_content = cached
+                cached_data = {
+                    "type": "content",
+                    "content": cached
+                }
+                yield _sse(cached_data)
+            else:
+                # Stream (message chunk, metadata) pairs for token-level streaming
+                async for msg_chunk, metadata in agent_graph.astream(
+                    {"messages": messages},
+                    stream_mode="messages"
+                ):
+                    handler = STREAM_HANDLERS.get(type(msg_chunk))
+                    if handler:
+                        for out in handler(msg_chunk, state):
+                            yield out
             
             # Final response is the last accumulated content
-            full_response = current_content if current_content else full_response
+            full_response = state.current_content or state.full_response
             
             # Save to memory
             if full_response:
-                memory_manager.add_message(request.session_id, "user", request.message)
-                memory_manager.add_message(request.session_id, "assistant", full_response)
+                cacheable = not state.tool_outputs
+                if cached is None and cacheable:
+                    memory_manager.cache_response(context, request.message, full_response)
+                await asyncio.to_thread(
+                    memory_manager.add_messages,
+                    request.session_id,
+                    [("user", request.message), ("assistant", full_response)]
+                )
+                await _semantic_record(
+                    request.session_id,
+                    request.message,
+                    query_embedding,
+                    full_response if cacheable else None
+                )
             
             # Send completion message
             completion_data = {
                 "type": "done",
                 "session_id": request.session_id,
                 "timestamp": datetime.utcnow().isoformat(),
-                "tool_count": len(tool_outputs)
+                "tool_count": len(state.tool_outputs)
             }
-            yield f"data: {json.dumps(completion_data)}\n\n"
+            yield _sse(completion_data)
             
         except Exception as e:
             error_data = {
                 "type": "error",
                 "error": str(e)
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield _sse(error_data)
     
     return StreamingResponse(
         generate(),
@@ -286,7 +395,7 @@ async def get_history(session_id: str, limit: int = 10):
         raise HTTPException(status_code=503, detail="Memory manager not initialized")
     
     try:
-        messages = memory_manager.get_recent_messages(session_id, limit)
+        messages = await asyncio.to_thread(memory_manager.get_recent_messages, session_id, limit)
         return {
             "session_id": session_id,
             "messages": messages,
@@ -299,13 +408,11 @@ async def get_history(session_id: str, limit: int = 10):
 @app.delete("/history/{session_id}", tags=["History"])
 async def clear_history(session_id: str):
     """Clear chat history for a session"""
+    if not memory_manager:
+        raise HTTPException(status_code=503, detail="Memory manager not initialized")
+    
     try:
-        conn = sqlite3.connect("chat_history.db")
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        deleted = await asyncio.to_thread(memory_manager.clear, session_id)
         
         return {
             "status": "success",
@@ -322,4 +429,13 @@ if __name__ == "__main__":
     print("="*60)
     print("🤖 Basic Agent API with Streaming")
     print("="*60)
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # Each worker is its own process with its own SQLite connection (WAL lets them share the file)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8001,
+        # "auto" picks uvloop/httptools when installed (not on Windows)
+        loop="auto",
+        http="auto",
+        workers=API_WORKERS
+    )
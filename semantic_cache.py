@@ -0,0 +1,138 @@
+"""
+basic_agent/semantic_cache.py - Per-session semantic response cache
+"""
+
+import sqlite3
+import threading
+from typing import Optional
+
+import numpy as np
+from langsmith import traceable
+
+from config import SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TOP_K
+from embeddings import OnnxEmbedder
+
+
+MAX_ENTRIES_PER_SESSION = 200
+
+
+class SemanticCache:
+    """
+    MeanCache-style cache in front of the agent.
+
+    Every user query of a session is embedded once and stored with the
+    embedding of the query before it (its context chain). A cached answer is
+    only reused when both the query and its context chain are similar, so
+    "and in Paris?" after two different questions is not a false hit.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock):
+        self._conn = conn
+        self._lock = lock
+        self._embedder = OnnxEmbedder()
+        # session_id -> [(query embedding, context embedding, response)]
+        self._sessions: dict[str, list[tuple[np.ndarray, Optional[np.ndarray], Optional[str]]]] = {}
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize cache table"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    context_embedding BLOB,
+                    response TEXT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chat_cache_session ON chat_cache(session_id, id)"
+            )
+
+    @traceable(name="embed_query")
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a query into a unit-length float32 vector"""
+        return self._embedder.encode([text])[0]
+
+    def _entries(self, session_id: str):
+        """In-memory index of a session, loaded from SQLite on first use"""
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            rows = self._conn.execute(
+                """SELECT embedding, context_embedding, response FROM chat_cache
+                   WHERE session_id = ?
+                   ORDER BY id DESC LIMIT ?""",
+                (session_id, MAX_ENTRIES_PER_SESSION)
+            ).fetchall()
+            entries = [
+                (
+                    np.frombuffer(emb, dtype=np.float32),
+                    np.frombuffer(ctx, dtype=np.float32) if ctx is not None else None,
+                    response
+                )
+                for emb, ctx, response in reversed(rows)
+            ]
+            self._sessions[session_id] = entries
+        return entries
+
+    @traceable(name="semantic_cache_lookup")
+    def lookup(self, session_id: str, embedding: np.ndarray) -> Optional[str]:
+        """Return a cached answer for a similar query asked in a similar context"""
+        with self._lock:
+            entries = self._entries(session_id)
+            # Entries from a different embedding model (other dimension) are not comparable
+            candidates = [e for e in entries if e[2] is not None and e[0].shape == embedding.shape]
+            if not candidates:
+                return None
+
+            # Context chain of the current query is the previous query, already embedded
+            context = entries[-1][0]
+            scores = np.stack([e[0] for e in candidates]) @ embedding
+            for i in np.argsort(scores)[::-1][:SEMANTIC_CACHE_TOP_K]:
+                if scores[i] < SEMANTIC_CACHE_THRESHOLD:
+                    break
+                _, cached_context, response = candidates[i]
+                # A first query had no context, the current one always has: never the same chain
+                if cached_context is None or cached_context.shape != context.shape:
+                    continue
+                if float(cached_context @ context) >= SEMANTIC_CACHE_THRESHOLD:
+                    return response
+            return None
+
+    def record(self, session_id: str, query: str, embedding: np.ndarray, response: Optional[str]):
+        """
+        Store a turn of the session.
+
+        `response` is None for answers that must not be reused (e.g. tool
+        results); the query is still kept as context for the next turn.
+        """
+        with self._lock:
+            entries = self._entries(session_id)
+            context = entries[-1][0] if entries else None
+            self._conn.execute(
+                """INSERT INTO chat_cache (session_id, query, embedding, context_embedding, response)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (
+                    session_id,
+                    query,
+                    embedding.tobytes(),
+                    context.tobytes() if context is not None else None,
+                    response
+                )
+            )
+            entries.append((embedding, context, response))
+            del entries[:-MAX_ENTRIES_PER_SESSION]
+
+    def clear(self, session_id: str):
+        """Forget all cached turns of a session"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_cache WHERE session_id = ?", (session_id,))
+            self._sessions.pop(session_id, None)
+
+    def invalidate(self, session_id: str):
+        """Drop the in-memory index of a session, it is reloaded from SQLite on next use"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
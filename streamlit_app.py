@@ -5,6 +5,7 @@ Uses backend's database directly - no separate session storage
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import uuid
 from datetime import datetime
@@ -35,20 +36,29 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def backend_session():
+    """Shared HTTP session so backend calls reuse keep-alive connections"""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+
+@st.cache_data(ttl=15)
 def get_all_sessions_from_db():
-    """Get all unique sessions from backend database"""
+    """Get all sessions, with their first user message, from backend database"""
     try:
         conn = sqlite3.connect(BACKEND_DB)
         cursor = conn.cursor()
         cursor.execute("""
             SELECT 
-                session_id, 
-                MIN(timestamp) as first_message,
-                MAX(timestamp) as last_message,
-                COUNT(*) as message_count
-            FROM chat_history 
-            GROUP BY session_id 
-            ORDER BY last_message DESC
+                s.uuid, 
+                m.first_user_message, 
+                m.last_timestamp, 
+                m.msg_count 
+            FROM session_meta m 
+            JOIN sessions s ON s.id = m.session_fk 
+            ORDER BY m.last_timestamp DESC
         """)
         sessions = cursor.fetchall()
         conn.close()
@@ -58,32 +68,18 @@ def get_all_sessions_from_db():
         return []
 
 
-def get_session_preview(session_id: str):
-    """Get first user message as session preview"""
-    try:
-        conn = sqlite3.connect(BACKEND_DB)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT content 
-            FROM chat_history 
-            WHERE session_id = ? AND role = 'user' 
-            ORDER BY id ASC 
-            LIMIT 1
-        """, (session_id,))
-        result = cursor.fetchone()
-        conn.close()
-        if result:
-            preview = result[0]
-            return preview[:50] + "..." if len(preview) > 50 else preview
+def format_preview(content):
+    """Shorten a message for display as session preview"""
+    if not content:
         return "Empty chat"
-    except Exception:
-        return "Unknown"
+    return content[:50] + "..." if len(content) > 50 else content
 
 
+@st.cache_data(ttl=30)
 def check_backend_health():
     """Check if backend is running"""
     try:
-        response = requests.get(f"{BACKEND_URL}/health", timeout=5)
+        response = backend_session().get(f"{BACKEND_URL}/health", timeout=5)
         return response.status_code == 200
     except Exception:
         return False
@@ -92,7 +88,7 @@ def check_backend_health():
 def get_chat_history(session_id: str):
     """Fetch chat history from backend"""
     try:
-        response = requests.get(
+        response = backend_session().get(
             f"{BACKEND_URL}/history/{session_id}",
             timeout=5
         )
@@ -108,11 +104,14 @@ def get_chat_history(session_id: str):
 def clear_backend_history(session_id: str):
     """Clear chat history from backend"""
     try:
-        response = requests.delete(
+        response = backend_session().delete(
             f"{BACKEND_URL}/history/{session_id}",
             timeout=5
         )
-        return response.status_code == 200
+        if response.status_code == 200:
+            get_all_sessions_from_db.clear()
+            return True
+        return False
     except Exception:
         return False
 
@@ -151,78 +150,74 @@ def send_message_streaming(message: str):
             "session_id": st.session_state.session_id
         }
         
-        response = requests.post(
+        # Context manager releases the pooled connection once the stream is done
+        with backend_session().post(
             url,
             json=payload,
             stream=True,
             timeout=60
-        )
-        
-        if response.status_code != 200:
-            return f"Error: {response.status_code}"
-        
-        # Placeholders for streaming
-        tool_placeholder = st.empty()
-        message_placeholder = st.empty()
-        
-        full_response = ""
-        tool_calls = []
-        tool_results = []
-        current_tools_shown = False
-        
-        # Process stream line by line
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    try:
-                        data = json.loads(line[6:])
-                        
-                        if data.get("type") == "tool_call":
-                            tools = data.get("tools", [])
-                            tool_calls.extend(tools)
-                            tool_placeholder.markdown(f"🔧 **Using tools:** {', '.join(tools)}")
-                            current_tools_shown = True
-                        
-                        elif data.get("type") == "tool_start":
-                            tool_name = data.get("tool", "unknown")
-                            tool_placeholder.markdown(f"⚙️ **Executing:** {tool_name}...")
-                        
-                        elif data.get("type") == "tool_result":
-                            tool_name = data.get("tool", "unknown")
-                            preview = data.get("preview", "")
-                            tool_results.append(f"{tool_name}: {preview[:100]}")
-                            tool_placeholder.markdown(f"✅ **Completed:** {tool_name}")
-                        
-                        elif data.get("type") == "token":
-                            # TRUE TOKEN-BY-TOKEN STREAMING
-                            full_response = data.get("content", "")
-                            message_placeholder.markdown(full_response + "▌")  # Show cursor
-                        
-                        elif data.get("type") == "content":
-                            # Fallback for complete content
-                            full_response = data.get("content", "")
-                            message_placeholder.markdown(full_response + "▌")
-                        
-                        elif data.get("type") == "done":
-                            # Remove cursor and clear tool placeholder
-                            if full_response:
-                                message_placeholder.markdown(full_response)
-                            else:
-                                message_placeholder.warning("No response generated. The tool may have encountered an issue.")
+        ) as response:
+            if response.status_code != 200:
+                return f"Error: {response.status_code}"
+            
+            # Placeholders for streaming
+            tool_placeholder = st.empty()
+            message_placeholder = st.empty()
+            
+            full_response = ""
+            tool_calls = []
+            tool_results = []
+            current_tools_shown = False
+            
+            # Process stream line by line
+            for line in response.iter_lines():
+                if line:
+                    line = line.decode('utf-8')
+                    if line.startswith('data: '):
+                        try:
+                            data = json.loads(line[6:])
                             
-                            if current_tools_shown:
-                                tool_placeholder.empty()
-                            break
+                            if data.get("type") == "tool_call":
+                                tools = data.get("tools", [])
+                                tool_calls.extend(tools)
+                                tool_placeholder.markdown(f"🔧 **Using tools:** {', '.join(tools)}")
+                                current_tools_shown = True
+                            
+                            elif data.get("type") == "tool_result":
+                                tool_name = data.get("tool", "unknown")
+                                preview = data.get("preview", "")
+                                tool_results.append(f"{tool_name}: {preview[:100]}")
+                                tool_placeholder.markdown(f"✅ **Completed:** {tool_name}")
+                            
+                            elif data.get("type") == "token":
+                                # TRUE TOKEN-BY-TOKEN STREAMING
+                                full_response = data.get("content", "")
+                                message_placeholder.markdown(full_response + "▌")  # Show cursor
+                            
+                            elif data.get("type") == "content":
+                                # Fallback for complete content
+                                full_response = data.get("content", "")
+                                message_placeholder.markdown(full_response + "▌")
+                            
+                            elif data.get("type") == "done":
+                                # Remove cursor and clear tool placeholder
+                                if full_response:
+                                    message_placeholder.markdown(full_response)
+                                else:
+                                    message_placeholder.warning("No response generated. The tool may have encountered an issue.")
+                                
+                                if current_tools_shown:
+                                    tool_placeholder.empty()
+                                break
+                            
+                            elif data.get("type") == "error":
+                                st.error(f"Error: {data.get('error')}")
+                                return None
                         
-                        elif data.get("type") == "error":
-                            st.error(f"Error: {data.get('error')}")
-                            return None
-                    
-                    except json.JSONDecodeError:
-                        continue
-        
-        return full_response
+                        except json.JSONDecodeError:
+                            continue
+            
+            return full_response
     
     except Exception as e:
         st.error(f"Failed to send message: {e}")
@@ -262,11 +257,11 @@ with st.sidebar:
     sessions = get_all_sessions_from_db()
     
     if sessions:
-        for session_id, first_msg, last_msg, msg_count in sessions:
+        for session_id, first_user_msg, last_msg, msg_count in sessions:
             is_current = session_id == st.session_state.session_id
             
             # Get preview text
-            preview = get_session_preview(session_id)
+            preview = format_preview(first_user_msg)
             
             # Format timestamp
             try:
@@ -353,8 +348,15 @@ if prompt := st.chat_input("Type your message here...", disabled=not is_healthy)
                 "role": "assistant",
                 "content": response
             })
+            # New turn changes the sidebar (new session, counts, ordering)
+            get_all_sessions_from_db.clear()
 
 
 st.divider()
-current_preview = get_session_preview(st.session_state.session_id)
+# Same cached session list as the sidebar, refreshed above if this run added a turn
+current_first_msg = next(
+    (first for sid, first, _, _ in get_all_sessions_from_db() if sid == st.session_state.session_id),
+    None
+)
+current_preview = format_preview(current_first_msg)
 st.caption(f"💬 {current_preview} | 🔗 Backend: {BACKEND_URL}")
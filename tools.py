@@ -4,15 +4,89 @@ basic_agent/tools.py - Basic Tools with LangSmith Tracing
 
 from langchain_core.tools import tool
 from langsmith import traceable
-import requests
+from cachetools import TTLCache
+from cachetools.keys import hashkey
+import functools
+import httpx
 import os
 from datetime import datetime
 import pytz
 
 
+# Shared client: keeps TLS connections alive between tool calls
+_client = httpx.AsyncClient(
+    http2=True,
+    timeout=20.0,
+    limits=httpx.Limits(max_keepalive_connections=20),
+    headers={"User-Agent": "basic-agent/1.0"}
+)
+
+
+async def close_http_client():
+    """Close the shared HTTP client (call on app shutdown)"""
+    await _client.aclose()
+
+
+def ttl_cached(cache: TTLCache, key=hashkey):
+    """Cache results of an async function for the cache's TTL (exceptions are not cached)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs)
+            try:
+                return cache[k]
+            except KeyError:
+                pass
+            result = await func(*args, **kwargs)
+            cache[k] = result
+            return result
+        return wrapper
+    return decorator
+
+
+@ttl_cached(TTLCache(maxsize=256, ttl=60), key=lambda query, api_key: hashkey(query.strip().lower()))
+async def _search_results(query: str, api_key: str) -> list:
+    """Raw Tavily search results"""
+    payload = {
+        "api_key": api_key,
+        "query": query,
+        "search_depth": "basic",
+        "max_results": 5
+    }
+    response = await _client.post("https://api.tavily.com/search", json=payload, timeout=10)
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
+@ttl_cached(TTLCache(maxsize=256, ttl=300), key=lambda city: hashkey(city.strip().lower()))
+async def _current_weather(city: str) -> dict:
+    """Current conditions from wttr.in"""
+    response = await _client.get(f"https://wttr.in/{city}?format=j1")
+    response.raise_for_status()
+    return response.json()["current_condition"][0]
+
+
+@ttl_cached(TTLCache(maxsize=256, ttl=3600))
+async def _exchange_rates(base: str) -> dict:
+    """Exchange rates for one base currency"""
+    response = await _client.get(f"https://api.exchangerate-api.com/v4/latest/{base}")
+    response.raise_for_status()
+    return response.json()["rates"]
+
+
+@ttl_cached(TTLCache(maxsize=256, ttl=3600))
+async def _wikipedia_page(topic: str) -> dict:
+    """Wikipedia REST summary of a page"""
+    response = await _client.get(
+        f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic.replace(' ', '_')}"
+    )
+    response.raise_for_status()
+    return response.json()
+
+
 @tool
 @traceable(name="tavily_search_tool")
-def tavily_search(query: str) -> str:
+async def tavily_search(query: str) -> str:
     """
     Search the internet using Tavily API for current information.
     
@@ -27,19 +101,10 @@ def tavily_search(query: str) -> str:
         return "Error: TAVILY_API_KEY not set"
     
     try:
-        url = "https://api.tavily.com/search"
-        payload = {
-            "api_key": api_key,
-            "query": query,
-            "search_depth": "basic",
-            "max_results": 5
-        }
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        search_results = await _search_results(query, api_key)
         
         results = []
-        for item in data.get("results", [])[:3]:
+        for item in search_results[:3]:
             results.append(
                 f"• {item.get('title', 'No title')}\n"
                 f"  {item.get('content', 'No content')}\n"
@@ -53,7 +118,7 @@ def tavily_search(query: str) -> str:
 
 @tool
 @traceable(name="get_weather_tool")
-def get_weather(city: str) -> str:
+async def get_weather(city: str) -> str:
     """
     Get current weather information for a city.
     
@@ -64,12 +129,7 @@ def get_weather(city: str) -> str:
         Current weather information
     """
     try:
-        url = f"https://wttr.in/{city}?format=j1"
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-        
-        current = data["current_condition"][0]
+        current = await _current_weather(city)
         weather_info = f"""Weather in {city}:
 • Temperature: {current['temp_C']}°C / {current['temp_F']}°F
 • Condition: {current['weatherDesc'][0]['value']}
@@ -84,7 +144,7 @@ def get_weather(city: str) -> str:
 
 @tool
 @traceable(name="convert_currency_tool")
-def convert_currency(amount: float, from_currency: str, to_currency: str) -> str:
+async def convert_currency(amount: float, from_currency: str, to_currency: str) -> str:
     """
     Convert currency from one type to another.
     
@@ -97,12 +157,9 @@ def convert_currency(amount: float, from_currency: str, to_currency: str) -> str
         Converted amount with rate information
     """
     try:
-        url = f"https://api.exchangerate-api.com/v4/latest/{from_currency.upper()}"
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        data = response.json()
+        rates = await _exchange_rates(from_currency.upper())
         
-        rate = data["rates"].get(to_currency.upper())
+        rate = rates.get(to_currency.upper())
         if not rate:
             return f"Currency {to_currency} not found"
         
@@ -117,7 +174,7 @@ def convert_currency(amount: float, from_currency: str, to_currency: str) -> str
 
 @tool
 @traceable(name="get_wikipedia_summary_tool")
-def get_wikipedia_summary(topic: str) -> str:
+async def get_wikipedia_summary(topic: str) -> str:
     """
     Get a summary of a topic from Wikipedia.
     
@@ -128,10 +185,7 @@ def get_wikipedia_summary(topic: str) -> str:
         Wikipedia summary text
     """
     try:
-        url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic.replace(' ', '_')}"
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        data = response.json()
+        data = await _wikipedia_page(topic)
         
         summary = f"""**{data.get('title', topic)}**
 
@@ -146,7 +200,7 @@ Read more: {data.get('content_urls', {}).get('desktop', {}).get('page', 'N/A')}"
 
 @tool
 @traceable(name="get_world_time_tool")
-def get_world_time(timezone: str) -> str:
+async def get_world_time(timezone: str) -> str:
     """
     Get current time in a specific timezone.
     